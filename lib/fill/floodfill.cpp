@@ -10,8 +10,14 @@
 #include "floodfill.hpp"
 
 #include <cmath>
+#include <cstdint>
+#include <cstring>
 #include <vector>
 
+#ifdef __AVX2__
+#include <immintrin.h>
+#endif
+
 /*
   Returns a list [(start, end)] of segments corresponding
   to contiguous occurrences of "true" in the given boolean array.
@@ -133,8 +139,8 @@ Filler::pixel_fill_alpha(const rgba& px)
 */
 bool
 Filler::check_enqueue(
-    const int x, const int y, bool check, const rgba& src_pixel,
-    const chan_t& dst_pixel)
+    std::queue<coord>& seed_queue, const int x, const int y, bool check,
+    const rgba& src_pixel, const chan_t& dst_pixel)
 {
     if (dst_pixel != 0) return true;
     bool match = pixel_fill_alpha(src_pixel) > 0;
@@ -145,6 +151,36 @@ Filler::check_enqueue(
     return !match;
 }
 
+/*
+  Check if all pixels of a C-contiguous N x N rgba tile are identical.
+
+  Each pixel is compared as a single 64 bit word, or, when built with
+  AVX2 support, four pixels at a time. Non-uniform tiles are usually
+  rejected within the first few comparisons.
+*/
+static bool
+rgba_tile_is_uniform(const chan_t* pixels)
+{
+    uint64_t first;
+    memcpy(&first, pixels, sizeof(first));
+#ifdef __AVX2__
+    const __m256i ref = _mm256_set1_epi64x(first);
+    const __m256i* chunks = reinterpret_cast<const __m256i*>(pixels);
+    for (int i = 0; i < (N * N) / 4; ++i) {
+        const __m256i eq =
+            _mm256_cmpeq_epi64(_mm256_loadu_si256(chunks + i), ref);
+        if (_mm256_movemask_epi8(eq) != -1) return false;
+    }
+#else
+    for (int i = 1; i < N * N; ++i) {
+        uint64_t px;
+        memcpy(&px, pixels + 4 * i, sizeof(px));
+        if (px != first) return false;
+    }
+#endif
+    return true;
+}
+
 /*
   If the input tile is:
 
@@ -160,8 +196,14 @@ Filler::tile_uniformity(bool empty_tile, PyObject* src_arr)
     }
 
     PixelBuffer<rgba> src = PixelBuffer<rgba>(src_arr);
+    PyArrayObject* arr = (PyArrayObject*)src_arr;
+
+    const bool uniform =
+        PyArray_IS_C_CONTIGUOUS(arr)
+            ? rgba_tile_is_uniform((const chan_t*)PyArray_DATA(arr))
+            : src.is_uniform();
 
-    if (src.is_uniform()) {
+    if (uniform) {
         chan_t alpha = pixel_fill_alpha(src(0, 0));
         return Py_BuildValue("i", alpha);
     }
@@ -170,21 +212,56 @@ Filler::tile_uniformity(bool empty_tile, PyObject* src_arr)
     return Py_None;
 }
 
+PyObject*
+Filler::flood_if_nonuniform(PyObject* src_arr, PyObject* dst)
+{
+    PyObject* alpha = tile_uniformity(false, src_arr);
+    if (alpha == Py_None) flood(src_arr, dst);
+    return alpha;
+}
+
+/*
+  Read the two integers of a seed coordinate or seed range tuple.
+  Plain 2-tuples, which is what the seeds normally consist of,
+  are read directly instead of going through argument parsing.
+  Invalid seeds are skipped, so the error of a failed read is
+  cleared instead of being left set for unrelated calls to find.
+*/
+static bool
+read_int_pair(PyObject* pair, int& a, int& b)
+{
+    bool valid;
+    if (PyTuple_CheckExact(pair) && PyTuple_GET_SIZE(pair) == 2) {
+        a = (int)PyLong_AsLong(PyTuple_GET_ITEM(pair, 0));
+        b = (int)PyLong_AsLong(PyTuple_GET_ITEM(pair, 1));
+        valid = !((a == -1 || b == -1) && PyErr_Occurred());
+    } else {
+        valid = PyArg_ParseTuple(pair, "ii", &a, &b);
+    }
+    if (!valid) PyErr_Clear();
+    return valid;
+}
+
 void
 Filler::queue_seeds(
-    PyObject* seeds, PixelBuffer<rgba>& src, PixelBuffer<chan_t> dst)
+    std::queue<coord>& seed_queue, PyObject* seeds, PixelBuffer<rgba>& src,
+    PixelBuffer<chan_t> dst)
 {
-    Py_ssize_t num_seeds = PySequence_Size(seeds);
+    PyObject* seq = PySequence_Fast(seeds, "seeds must be a sequence");
+    if (!seq) {
+        PyErr_Clear();
+        return;
+    }
+    Py_ssize_t num_seeds = PySequence_Fast_GET_SIZE(seq);
     for (Py_ssize_t i = 0; i < num_seeds; ++i) {
-        PyObject* seed_tuple = PySequence_GetItem(seeds, i);
         int x;
         int y;
-        PyArg_ParseTuple(seed_tuple, "ii", &x, &y);
-        Py_DECREF(seed_tuple);
+        if (!read_int_pair(PySequence_Fast_GET_ITEM(seq, i), x, y)) continue;
         if (!dst(x, y) && pixel_fill_alpha(src(x, y)) > 0) {
             seed_queue.push(coord(x, y));
         }
     }
+    Py_DECREF(seq);
 }
 
 /*
@@ -197,8 +274,8 @@ Filler::queue_seeds(
 */
 void
 Filler::queue_ranges(
-    edge origin, PyObject* seeds, bool input_marks[N], PixelBuffer<rgba>& src,
-    PixelBuffer<chan_t>& dst)
+    std::queue<coord>& seed_queue, edge origin, PyObject* seeds,
+    bool input_marks[N], PixelBuffer<rgba>& src, PixelBuffer<chan_t>& dst)
 {
 #ifdef HEAVY_DEBUG
     assert(PySequence_Check(seeds));
@@ -210,24 +287,25 @@ Filler::queue_ranges(
     int x_offs = (origin + 1) % 2;
     int y_offs = origin % 2;
 
-    for (int i = 0; i < PySequence_Size(seeds); ++i) {
+    PyObject* seq = PySequence_Fast(seeds, "seeds must be a sequence");
+    if (!seq) {
+        PyErr_Clear();
+        return;
+    }
+    const Py_ssize_t num_segments = PySequence_Fast_GET_SIZE(seq);
+
+    for (Py_ssize_t i = 0; i < num_segments; ++i) {
 
         int seg_start;
         int seg_end;
-        PyObject* segment = PySequence_GetItem(seeds, i);
+        // Borrowed reference
+        PyObject* segment = PySequence_Fast_GET_ITEM(seq, i);
 
 #ifdef HEAVY_DEBUG
         assert(PyTuple_CheckExact(segment));
         assert(PySequence_Size(segment) == 2);
 #endif
-        if (!PyArg_ParseTuple(segment, "ii", &seg_start, &seg_end)) {
-            Py_DECREF(segment);
-            continue;
-        }
-        Py_DECREF(segment);
-#ifdef HEAVY_DEBUG
-        assert(segment->ob_refcnt == 1);
-#endif
+        if (!read_int_pair(segment, seg_start, seg_end)) continue;
 
         // Check all pixels in the segment, adding the first
         // of every contiguous section to the queue
@@ -250,6 +328,7 @@ Filler::queue_ranges(
             }
         }
     }
+    Py_DECREF(seq);
 }
 
 /*
@@ -267,6 +346,9 @@ Filler::queue_ranges(
 
   The bounds defined by the min/max,x/y parameters limit the fill
   within the tile, if they are more constrained than (0, 0, N-1, N-1)
+
+  The seed queue is local to the call, and the GIL is released while
+  the fill loop runs, permitting concurrent fills of different tiles.
 */
 PyObject*
 Filler::fill(
@@ -287,14 +369,16 @@ Filler::fill(
     assert(PySequence_Check(seeds));
 #endif
 
+    std::queue<coord> seed_queue;
+
     // Store input seed positions to filter them out
     // prior to constructing the output seed segment lists
     bool input_seeds[N] = {0,};
 
     if (seed_origin == edges::none) { // Initial seeds, a list of coordinates
-        queue_seeds(seeds, src, dst);
+        queue_seeds(seed_queue, seeds, src, dst);
     } else {
-        queue_ranges(seed_origin, seeds, input_seeds, src, dst);
+        queue_ranges(seed_queue, seed_origin, seeds, input_seeds, src, dst);
     } // Seed queue populated
 
     // 0-initialized arrays used to mark points reached on
@@ -303,7 +387,8 @@ Filler::fill(
     bool _n[N] = {0,}, _e[N] = {0,}, _s[N] = {0,}, _w[N] = {0,};
     bool* edge_marks[] = {_n, _e, _s, _w};
 
-    // Fill loop
+    // Fill loop - no Python API calls are made here
+    Py_BEGIN_ALLOW_THREADS
     while (!seed_queue.empty()) {
 
         int x0 = seed_queue.front().x;
@@ -342,13 +427,15 @@ Filler::fill(
 
                 if (y > 0) {
                     look_above = check_enqueue( //check/enqueue above
-                        x, y-1, look_above, src_px.above(), dst_px.above());
+                        seed_queue, x, y-1, look_above,
+                        src_px.above(), dst_px.above());
                 } else {
                     _n[x] = true; // On northern edge
                 }
                 if (y < (N - 1)) {
                     look_below = check_enqueue( // check/enqueue below
-                        x, y+1, look_below, src_px.below(), dst_px.below());
+                        seed_queue, x, y+1, look_below,
+                        src_px.below(), dst_px.below());
                 } else {
                     _s[x] = true; // On southern edge
                 }
@@ -361,6 +448,7 @@ Filler::fill(
             }
         }
     }
+    Py_END_ALLOW_THREADS
 
     if (seed_origin != edges::none) {
         // Remove incoming seeds from outgoing seeds
@@ -374,9 +462,57 @@ Filler::fill(
         "[NNNN]", to_seeds(_n), to_seeds(_e), to_seeds(_s), to_seeds(_w));
 }
 
+/*
+  Zero tolerance flood of a C-contiguous rgba tile into a C-contiguous
+  alpha tile. With zero tolerance, a pixel is either identical to the
+  target color or not filled at all (fully transparent pixels always
+  match a fully transparent target), so each pixel is tested with a
+  single masked 64 bit comparison, four pixels at a time with AVX2.
+*/
+static void
+flood_exact(const chan_t* pixels, chan_t* alphas, uint64_t mask, uint64_t ref)
+{
+#ifdef __AVX2__
+    const __m256i vmask = _mm256_set1_epi64x(mask);
+    const __m256i vref = _mm256_set1_epi64x(ref);
+    const __m256i* chunks = reinterpret_cast<const __m256i*>(pixels);
+    for (int i = 0; i < (N * N) / 4; ++i) {
+        const __m256i px =
+            _mm256_and_si256(_mm256_loadu_si256(chunks + i), vmask);
+        const int matches = _mm256_movemask_pd(
+            _mm256_castsi256_pd(_mm256_cmpeq_epi64(px, vref)));
+        for (int j = 0; j < 4; ++j) {
+            alphas[4 * i + j] = fix15_one * ((matches >> j) & 1);
+        }
+    }
+#else
+    for (int i = 0; i < N * N; ++i) {
+        uint64_t px;
+        memcpy(&px, pixels + 4 * i, sizeof(px));
+        alphas[i] = fix15_one * ((px & mask) == ref);
+    }
+#endif
+}
+
 void
 Filler::flood(PyObject* src_arr, PyObject* dst_arr)
 {
+    if (tolerance == 0 && PyArray_IS_C_CONTIGUOUS((PyArrayObject*)src_arr) &&
+        PyArray_IS_C_CONTIGUOUS((PyArrayObject*)dst_arr)) {
+        // Compare whole pixels, or only the alpha channel
+        // when the target color is fully transparent
+        const rgba alpha_only((chan_t)0, 0, 0, (chan_t)0xffff);
+        uint64_t mask = ~(uint64_t)0;
+        uint64_t ref = 0;
+        if (target_color.alpha == 0)
+            memcpy(&mask, &alpha_only, sizeof(mask));
+        else
+            memcpy(&ref, &target_color_premultiplied, sizeof(ref));
+        flood_exact(
+            (const chan_t*)PyArray_DATA((PyArrayObject*)src_arr),
+            (chan_t*)PyArray_DATA((PyArrayObject*)dst_arr), mask, ref);
+        return;
+    }
     PixelRef<rgba> src_px = PixelBuffer<rgba>(src_arr).get_pixel(0, 0);
     PixelRef<chan_t> dst_px = PixelBuffer<chan_t>(dst_arr).get_pixel(0, 0);
     for (int i = 0; i < N * N; ++i, src_px.move_x(1), dst_px.move_x(1)) {
@@ -385,15 +521,92 @@ Filler::flood(PyObject* src_arr, PyObject* dst_arr)
 }
 
 PyObject*
-rgba_tile_from_alpha_tile(
+filter_overflows(
+    int tx, int ty, PyObject* seeds, PyObject* data, PyObject* skip,
+    int min_tx, int min_ty, int max_tx, int max_ty)
+{
+    // Neighbour offsets in the order: north, east, south, west
+    static const int offsets[4][2] = {{0, -1}, {1, 0}, {0, 1}, {-1, 0}};
+    const bool with_data = data != Py_None;
+    const bool with_skip = skip != Py_None;
+
+    PyObject* overflows = PyList_New(0);
+    if (!overflows) return NULL;
+
+    for (int i = 0; i < 4; ++i) {
+        const int x = tx + offsets[i][0];
+        const int y = ty + offsets[i][1];
+        if (x < min_tx || x > max_tx || y < min_ty || y > max_ty) continue;
+
+        PyObject* edge_seeds = PySequence_GetItem(seeds, i);
+        if (!edge_seeds) {
+            Py_DECREF(overflows);
+            return NULL;
+        }
+        const int has_seeds = PyObject_IsTrue(edge_seeds);
+        if (has_seeds != 1) {
+            Py_DECREF(edge_seeds);
+            if (has_seeds == 0) continue;
+            Py_DECREF(overflows);
+            return NULL;
+        }
+        PyObject* edge_coord = Py_BuildValue("ii", x, y);
+        if (!edge_coord) {
+            Py_DECREF(edge_seeds);
+            Py_DECREF(overflows);
+            return NULL;
+        }
+        const int skipped =
+            with_skip ? PySequence_Contains(skip, edge_coord) : 0;
+        if (skipped != 0) {
+            Py_DECREF(edge_coord);
+            Py_DECREF(edge_seeds);
+            if (skipped == 1) continue;
+            Py_DECREF(overflows);
+            return NULL;
+        }
+        // The new references to the coord, seeds and data are stolen ("N"),
+        // also when building the tuple fails.
+        PyObject* overflow;
+        if (with_data) {
+            PyObject* edge_data = PySequence_GetItem(data, i);
+            if (!edge_data) {
+                Py_DECREF(edge_coord);
+                Py_DECREF(edge_seeds);
+                Py_DECREF(overflows);
+                return NULL;
+            }
+            overflow =
+                Py_BuildValue("(NNN)", edge_coord, edge_seeds, edge_data);
+        } else {
+            overflow = Py_BuildValue("(NN)", edge_coord, edge_seeds);
+        }
+        if (!overflow || PyList_Append(overflows, overflow) != 0) {
+            Py_XDECREF(overflow);
+            Py_DECREF(overflows);
+            return NULL;
+        }
+        Py_DECREF(overflow);
+#ifdef HEAVY_DEBUG
+        assert(overflow->ob_refcnt == 1);
+#endif
+    }
+    return overflows;
+}
+
+void
+rgba_tile_from_alpha_tile_into(
     PyObject* src, double fill_r, double fill_g, double fill_b, int min_x,
-    int min_y, int max_x, int max_y)
+    int min_y, int max_x, int max_y, PyObject* dst)
 {
-    npy_intp dims[] = {N, N, 4};
-    // A zeroed array is used instead of an empty, since
-    // less than the entire output tile may be written to.
-    PyObject* dst_arr = PyArray_ZEROS(3, dims, NPY_USHORT, 0);
-    PixelBuffer<rgba> dst_buf(dst_arr);
+    // Clear the pixels that are not written to
+    if (min_x > 0 || min_y > 0 || max_x < (N - 1) || max_y < (N - 1)) {
+        PixelRef<rgba> dst_px = PixelBuffer<rgba>(dst).get_pixel(0, 0);
+        for (int i = 0; i < N * N; ++i, dst_px.move_x(1)) {
+            dst_px.write(rgba());
+        }
+    }
+    PixelBuffer<rgba> dst_buf(dst);
     PixelBuffer<chan_t> src_buf(src);
     for (int y = min_y; y <= max_y; ++y) {
         int x = min_x;
@@ -403,5 +616,4 @@ rgba_tile_from_alpha_tile(
             dst_px.write(rgba(fill_r, fill_g, fill_b, src_px.read()));
         }
     }
-    return dst_arr;
 }
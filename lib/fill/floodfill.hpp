@@ -35,13 +35,13 @@ class Filler
     const rgba target_color;
     const rgba target_color_premultiplied;
     const fix15_t tolerance;
-    std::queue<coord> seed_queue;
 
   public:
     Filler(int targ_r, int targ_g, int targ_b, int targ_a, double tol);
     // Perform a scanline fill based on the rgba src tile and seed coordinates,
     // writing the resulting fill alphas to the dst tile and returning
-    // any new overflows
+    // any new overflows. The GIL is released during the fill itself, and
+    // the same filler can be used for different tiles from multiple threads.
     PyObject* fill(
         PyObject* src, PyObject* dst, PyObject* seeds, edge direction,
         int min_x, int min_y, int max_x, int max_y);
@@ -52,6 +52,10 @@ class Filler
     // (all pixels having the same rgba color)), and if it is
     // returning the fill alpha for that color, otherwise Py_None
     PyObject* tile_uniformity(bool is_empty, PyObject* src);
+    // If the rgba src tile is uniform, return the fill alpha for its color,
+    // otherwise flood the dst alpha tile and return Py_None.
+    // Equivalent to calling tile_uniformity, followed by flood if needed.
+    PyObject* flood_if_nonuniform(PyObject* src, PyObject* dst);
 
   private:
     // Pixel threshold test - the return value indicates the alpha value of the
@@ -60,20 +64,21 @@ class Filler
     chan_t pixel_fill_alpha(const rgba& src_px);
     // Queue seeds from a python list of (x, y) coordinate tuples
     void queue_seeds(
-        PyObject* seeds, PixelBuffer<rgba>& src, PixelBuffer<chan_t> dst);
+        std::queue<coord>& seed_queue, PyObject* seeds,
+        PixelBuffer<rgba>& src, PixelBuffer<chan_t> dst);
     // Queue seeds from a python list of [start, end] range tuples
     // paired with an input origin direction indicating the side of
     // the tile that the ranges apply to.
     // Ranges are left->right, top->down, and end-inclusive.
     void queue_ranges(
-        edge direction, PyObject* seeds, bool marks[N],
-        PixelBuffer<rgba>& src, PixelBuffer<chan_t>& dst);
+        std::queue<coord>& seed_queue, edge direction, PyObject* seeds,
+        bool marks[N], PixelBuffer<rgba>& src, PixelBuffer<chan_t>& dst);
     // Check if a pixel is a valid fill candidate (unfilled & within threshold)
     // Put it in the seed queue if true.
     // Return value means: "enqueue valid neighbours on same row".
     bool check_enqueue(
-        const int x, const int y, bool check, const rgba& src_px,
-        const chan_t& dst_px);
+        std::queue<coord>& seed_queue, const int x, const int y, bool check,
+        const rgba& src_px, const chan_t& dst_px);
 };
 
 /*
@@ -91,7 +96,9 @@ class GapClosingFiller
         PyObject* alphas, PyObject* distances, PyObject* dst, PyObject* seeds,
         int min_x, int min_y, int max_x, int max_y);
     // Progressively erase a fill until reaching a point where the detected
-    // is a certain amount larger than the smallest detected distance
+    // is a certain amount larger than the smallest detected distance.
+    // The previous values of changed pixels are returned as (x, y, value)
+    // rows, to allow the erasure to be rolled back.
     PyObject*
     unseep(PyObject* distances, PyObject* dst, PyObject* seeds, bool initial);
 
@@ -101,11 +108,30 @@ class GapClosingFiller
 };
 
 /*
-  Create and return an N x N rgba tile based on an rgb color
-  and a N x N tile of alpha values
+  Given the coordinate of a tile and a 4-sequence of seed lists
+  for its northern, eastern, southern and western neighbours,
+  return a list of (coordinate, seeds) tuples for the neighbours
+  that have seeds and lie within the given tile coordinate bounds.
+
+  If data is not None, it must be a sequence of length 4, and each
+  tuple will be extended with the item of the corresponding direction:
+  (coordinate, seeds, data_item)
+
+  If skip is not None, neighbours whose coordinates are contained
+  in it (typically a set of fully processed tiles) are left out.
+*/
+PyObject* filter_overflows(
+    int tx, int ty, PyObject* seeds, PyObject* data, PyObject* skip,
+    int min_tx, int min_ty, int max_tx, int max_ty);
+
+/*
+  Write an N x N rgba tile based on an rgb color and a N x N tile
+  of alpha values into an existing rgba tile. Pixels outside of
+  the bounds are cleared. Permits reusing a single output tile
+  when colorizing many alpha tiles in sequence.
 */
-PyObject* rgba_tile_from_alpha_tile(
+void rgba_tile_from_alpha_tile_into(
     PyObject* src, double fill_r, double fill_g, double fill_b, int min_x,
-    int min_y, int max_x, int max_y);
+    int min_y, int max_x, int max_y, PyObject* dst);
 
 #endif //FLOODFILL_HPP
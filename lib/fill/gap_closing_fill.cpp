@@ -10,6 +10,7 @@
 #include "floodfill.hpp"
 
 #include <cmath>
+#include <cstring>
 #include <vector>
 
 // Largest squared gap distance - represents infinity for distances
@@ -25,6 +26,29 @@ all_max_dist(chan_t seeds[N])
     return true;
 }
 
+// Record the value a pixel had before it was changed by unseeping
+static void
+record_change(std::vector<chan_t>& changes, int x, int y, chan_t value)
+{
+    changes.push_back(x);
+    changes.push_back(y);
+    changes.push_back(value);
+}
+
+// Create a (k, 3) array of (x, y, value) records
+static PyObject*
+changes_array(const std::vector<chan_t>& changes)
+{
+    npy_intp dims[] = {(npy_intp)(changes.size() / 3), 3};
+    PyObject* arr = PyArray_EMPTY(2, dims, NPY_USHORT, 0);
+    if (!changes.empty()) {
+        memcpy(
+            PyArray_DATA((PyArrayObject*)arr), changes.data(),
+            changes.size() * sizeof(chan_t));
+    }
+    return arr;
+}
+
 // Gap closing requires each seed to keep track of the maximum
 // detected distance it encountered on its path, hence ranges
 // are not used here.
@@ -203,6 +227,8 @@ GapClosingFiller::fill(
 
     int pixels_filled = 0;
 
+    // Fill loop - no Python API calls are made here
+    Py_BEGIN_ALLOW_THREADS
     while (!queue.empty()) {
         gc_coord c = queue.front();
         int x = c.x;
@@ -265,6 +291,7 @@ GapClosingFiller::fill(
         // Queue adjacent pixels
         queue_gc_seeds(queue, c, curr_dist, north, east, south, west);
     }
+    Py_END_ALLOW_THREADS
 
     PyObject* f_edge_list = PyList_New(0);
 
@@ -289,6 +316,9 @@ GapClosingFiller::fill(
 // Based on coordinates of places where the initial fill stopped due
 // to leaving an area with tracked distances, move back into the fill,
 // erasing it until the tracked distances grow at a certain rate.
+// Alongside the outgoing seeds and number of erased pixels, the previous
+// values of the changed pixels are returned, so that the erasure can be
+// rolled back without keeping a copy of the tile.
 PyObject*
 GapClosingFiller::unseep(
     PyObject* dists_arr, PyObject* dst_arr, PyObject* seeds, bool initial)
@@ -297,6 +327,10 @@ GapClosingFiller::unseep(
     PixelBuffer<chan_t> dst(dst_arr);
 
     std::queue<gc_coord> queue;
+    // Pixels overwritten by seeding; their previous values are recorded
+    // when seeded, so they are not recorded again when erased.
+    bool seeded[N][N] = {};
+    std::vector<chan_t> changes;
     // Populate the queue
     for (int i = 0; i < PySequence_Size(seeds); ++i) {
 
@@ -314,7 +348,12 @@ GapClosingFiller::unseep(
         // direction. Initial seeds are created during the fill process,
         // and the rest are created as part of the unseep process.
         if (initial ^ (dst(seed_pt.x, seed_pt.y) != 0)) {
-            dst(seed_pt.x, seed_pt.y) = fix15_one;
+            chan_t& px = dst(seed_pt.x, seed_pt.y);
+            if (!seeded[seed_pt.y][seed_pt.x]) {
+                seeded[seed_pt.y][seed_pt.x] = true;
+                if (px != 0) record_change(changes, seed_pt.x, seed_pt.y, px);
+            }
+            px = fix15_one;
             queue.push(seed_pt);
         }
     }
@@ -347,6 +386,7 @@ GapClosingFiller::unseep(
 
         if (dst(x, y) == 0) continue;
 
+        if (!seeded[y][x]) record_change(changes, x, y, dst(x, y));
         pixels_erased++;
         dst(x, y) = 0;
 
@@ -368,7 +408,8 @@ GapClosingFiller::unseep(
         queue_gc_seeds(queue, c, curr_dist, north, east, south, west);
     }
     return Py_BuildValue(
-        "[NNNNi]", simple_seeds(north, edges::north),
+        "[NNNNiN]", simple_seeds(north, edges::north),
         simple_seeds(east, edges::east), simple_seeds(south, edges::south),
-        simple_seeds(west, edges::west), pixels_erased);
+        simple_seeds(west, edges::west), pixels_erased,
+        changes_array(changes));
 }
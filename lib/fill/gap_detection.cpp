@@ -131,6 +131,8 @@ find_gaps(
     bool gaps_found = false;
 
     PixelBuffer<chan_t> radiuses(radiuses_arr);
+    // No Python API calls are made during the search
+    Py_BEGIN_ALLOW_THREADS
     // search for gaps in an approximate semi-circle
     for (int y = 0; y < 2 * r + N - 1;
          ++y) { // we check at most distance+1 pixels above any point
@@ -152,5 +154,6 @@ find_gaps(
             }
         }
     }
+    Py_END_ALLOW_THREADS
     return gaps_found;
 }
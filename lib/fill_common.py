@@ -29,6 +29,9 @@ _FULL_TILE.flags.writeable = False
 _EMPTY_TILE = lib.mypaintlib.ConstTiles.ALPHA_TRANSPARENT()
 _EMPTY_TILE.flags.writeable = False
 
+# In-tile pixel bounds covering an entire tile
+_FULL_BOUNDS = (0, 0, N - 1, N - 1)
+
 
 def new_full_tile(value, dimensions=(N, N), value_type='uint16'):
     """Return a new tile filled with the given value"""
@@ -37,6 +40,14 @@ def new_full_tile(value, dimensions=(N, N), value_type='uint16'):
     return tile
 
 
+# Tile coordinate offsets of the nine-grid, see nine_grid()
+_NINE_GRID_OFFSETS = (
+    (0, 0), (0, -1), (1, 0), (0, 1), (-1, 0),
+    (1, -1), (1, 1), (-1, 1), (-1, -1)
+)
+_ADJACENT_OFFSETS = _NINE_GRID_OFFSETS[1:]
+
+
 def nine_grid(tile_coord):
     """ Return the input coordinate along with its neighbours.
 
@@ -48,11 +59,7 @@ def nine_grid(tile_coord):
     7 3 6
     """
     tile_x, tile_y = tile_coord
-    offsets = [
-        (0, 0), (0, -1), (1, 0), (0, 1), (-1, 0),
-        (1, -1), (1, 1), (-1, 1), (-1, -1)
-    ]
-    return [(tile_x+o[0], tile_y+o[1]) for o in offsets]
+    return [(tile_x+ox, tile_y+oy) for ox, oy in _NINE_GRID_OFFSETS]
 
 
 def adjacent(tile_coord):
@@ -65,20 +72,8 @@ def adjacent(tile_coord):
     3   1
     6 2 5
     """
-    return nine_grid(tile_coord)[1:]
-
-
-def orthogonal(tile_coord):
-    """ Return the coordinates orthogonal to the input coordinate.
-
-    Return coordinates orthogonal to the input coordinate,
-    in the following order:
-
-      0
-    3   1
-      2
-    """
-    return nine_grid(tile_coord)[1:5]
+    tile_x, tile_y = tile_coord
+    return [(tile_x+ox, tile_y+oy) for ox, oy in _ADJACENT_OFFSETS]
 
 
 class TileBoundingBox(object):
@@ -89,6 +84,13 @@ class TileBoundingBox(object):
     for individual tiles, based on their coordinates.
     """
 
+    # The bounds are read for every tile processed during a fill
+    __slots__ = (
+        'min_tx', 'min_ty', 'max_tx', 'max_ty',
+        'min_px', 'min_py', 'max_px', 'max_py',
+        'no_tile_crossing',
+    )
+
     def __init__(self, bbox):
         """
         Create a new TileBoundingBox based on a pixel bounding box.
@@ -109,7 +111,7 @@ class TileBoundingBox(object):
         self.max_py = int(bb_ry % N)
         self.no_tile_crossing = (
             (self.min_px, self.min_py, self.max_px, self.max_py) ==
-            (0, 0, N - 1, N - 1)
+            _FULL_BOUNDS
         )
 
     def tile_bounds(self, tc):
@@ -119,7 +121,7 @@ class TileBoundingBox(object):
         the tile actually lies inside the bounding box.
         """
         if self.no_tile_crossing:
-            return 0, 0, N - 1, N - 1
+            return _FULL_BOUNDS
         tx, ty = tc
         min_x = self.min_px if tx == self.min_tx else 0
         min_y = self.min_py if ty == self.min_ty else 0
@@ -8,7 +8,13 @@
 
 """This module implements tile-based floodfill and related operations."""
 
+import contextlib
+import functools
+import itertools
 import logging
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import numpy as np
 import threading
@@ -20,11 +26,10 @@ import lib.mypaintlib as myplib
 import lib.surface
 from lib.gettext import C_
 import lib.fill_common as fc
-from lib.fill_common import _OPAQUE, _FULL_TILE, _EMPTY_TILE
+from lib.fill_common import _OPAQUE, _FULL_TILE, _EMPTY_TILE, _FULL_BOUNDS
 import lib.modes
 import lib.morphology
 
-from lib.pycompat import iteritems
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +46,118 @@ _GAPLESS_TILE.flags.writeable = False
 
 EDGE = myplib.edges
 
+# Directions of origin for the seeds overflowing to the
+# northern, eastern, southern and western neighbours
+_INV_EDGES = (EDGE.south, EDGE.west, EDGE.north, EDGE.east)
+
+# Minimum number of tiles ready to be filled at the same time
+# for the fill work to be distributed over multiple threads
+_MIN_PARALLEL_BATCH = 4
+
+
+class _TilePool(object):
+    """Bounded free-list of N x N uint16 tiles
+
+    Output, alpha and distance tiles are only needed for the duration
+    of a single fill. Instead of allocating new arrays for every tile of
+    every fill, tiles are handed back to the pool when a fill is done and
+    reset in place when they are reused.
+
+    When the pool runs dry it is refilled with views into a single
+    zeroed (slab_size, N, N) array, so that tiles handed out in succession
+    lie next to each other in memory instead of being scattered on the
+    heap. Zeroed tiles from a new slab are handed out without resetting.
+
+    The pool is shared by all fills, which run in separate threads,
+    so the free-list is only ever modified while holding the lock.
+    """
+
+    def __init__(self, max_size, slab_size=16):
+        self.max_size = max_size
+        self.slab_size = min(slab_size, max_size)
+        self._free = []
+        # Number of never used (zeroed) tiles at the bottom of the list
+        self._fresh = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, value):
+        """Return a tile with every element set to the given value"""
+        with self._lock:
+            free = self._free
+            if not free:
+                slab = np.zeros((self.slab_size, N, N), 'uint16')
+                # Reversed, so the tiles are popped in memory order
+                free.extend(slab[::-1])
+                self._fresh = self.slab_size
+            fresh = len(free) <= self._fresh
+            tile = free.pop()
+            if fresh:
+                self._fresh -= 1
+        if not (fresh and value == 0):
+            tile.fill(value)
+        return tile
+
+    def zeros(self):
+        """Return a zeroed tile"""
+        return self.acquire(0)
+
+    def release(self, tiles):
+        """Return tiles that are no longer used to the pool
+
+        Constant (read-only) tiles, and tiles that are not plain
+        N x N uint16 arrays, are ignored. The same tile may occur
+        multiple times in the input, but is only added once.
+        """
+        released = []
+        ids = set()
+        for tile in tiles:
+            if len(released) >= self.max_size:
+                break
+            if id(tile) in ids or not tile.flags.writeable:
+                continue
+            if tile.shape != (N, N) or tile.dtype != np.uint16:
+                continue
+            ids.add(id(tile))
+            released.append(tile)
+        with self._lock:
+            free = self._free
+            free.extend(released[:max(0, self.max_size - len(free))])
+
+
+# Tiles are 8KiB each, so the pool is capped at a couple of megabytes
+_TILE_POOL = _TilePool(256)
+
+
+@functools.lru_cache(maxsize=256)
+def _uniform_alpha_tile(alpha):
+    """Return a shared, read-only tile with every element set to alpha
+
+    Uniform alpha tiles are only ever read from, so a single instance per
+    alpha value is shared between all fills. Code consuming fill results
+    must never write to these tiles. Fully opaque and fully transparent
+    tiles are the _FULL_TILE and _EMPTY_TILE constants.
+    """
+    if alpha == _OPAQUE:
+        return _FULL_TILE
+    if alpha == 0:
+        return _EMPTY_TILE
+    tile = fc.new_full_tile(alpha)
+    tile.flags.writeable = False
+    return tile
+
+
+@functools.lru_cache(maxsize=16)
+def _full_rgba_tile(fill_r, fill_g, fill_b):
+    """Return a shared, read-only, fully opaque rgba tile of the given color
+
+    Successive fills using the same color reuse the same tile.
+    """
+    tile = np.empty((N, N, 4), 'uint16')
+    myplib.rgba_tile_from_alpha_tile_into(
+        _FULL_TILE, fill_r, fill_g, fill_b, 0, 0, N-1, N-1, tile)
+    tile.flags.writeable = False
+    return tile
+
 
 class GapClosingOptions:
     """Container of parameters for gap closing fill operations
@@ -52,27 +169,34 @@ class GapClosingOptions:
         self.retract_seeps = retract_seeps
 
 
-def enqueue_overflows(queue, tile_coord, seeds, tiles_bbox, *p):
-    """ Conditionally add (coordinate, seed list, data...) tuples to a queue.
+def enqueue_overflows(
+        queue, tile_coord, seeds, tiles_bbox, data=None, final=None):
+    """ Conditionally add (coordinate, seed list[, data]) tuples to a queue.
 
-    :param queue: the queue which may be appended
-    :type queue: list
+    :param queue: the queue which may be appended, consumed from the left
+    :type queue: collections.deque, or any other type supporting extend()
     :param tile_coord: the 2d coordinate in the middle of the seed coordinates
     :type tile_coord: (int, int)
     :param seeds: 4-tuple of seed lists for n, e, s, w, relative to tile_coord
     :type seeds: (list, list, list, list)
     :param tiles_bbox: the bounding box of the fill operation
     :type tiles_bbox: lib.fill_common.TileBoundingBox
-    :param p: tuples of length >= 4, items added to queue items w. same index
-
-    NOTE: This function improves readability significantly in exchange for a
-    small performance hit. Replace with explicit queueing if too slow.
+    :param data: 4-tuple of items added to queue items w. same index, or None
+    :param final: coordinates of fully processed tiles, which are not queued
+    :type final: set
+
+    The filtering of the neighbouring coordinates is done in C++,
+    since this is called for every tile processed in the fill loops.
+    The queue items are the tuples created there, as-is; splitting them
+    into parallel coordinate/direction arrays would mean rebuilding the
+    tuples in Python on every pop, which costs more than it saves.
     """
-    for edge in zip(*(fc.orthogonal(tile_coord), seeds) + p):
-        edge_coord = edge[0]
-        edge_seeds = edge[1]
-        if edge_seeds and not tiles_bbox.outside(edge_coord):
-            queue.append(edge)
+    tx, ty = tile_coord
+    queue.extend(myplib.filter_overflows(
+        tx, ty, seeds, data, final,
+        tiles_bbox.min_tx, tiles_bbox.min_ty,
+        tiles_bbox.max_tx, tiles_bbox.max_ty
+    ))
 
 
 def starting_coordinates(x, y):
@@ -101,9 +225,7 @@ def seeds_by_tile(seeds):
 def get_target_color(src, tx, ty, px, py):
     """Get the pixel color for the given tile/pixel coordinates"""
     with src.tile_request(tx, ty, readonly=True) as start:
-        targ_r, targ_g, targ_b, targ_a = [
-            int(c) for c in start[py][px]
-        ]
+        targ_r, targ_g, targ_b, targ_a = start[py, px].tolist()
     if targ_a == 0:
         targ_r, targ_g, targ_b = 0, 0, 0
 
@@ -326,11 +448,15 @@ def _flood_fill(src, args, dst, handler):
 
     # Dilate/Erode (Grow/Shrink)
     if offset != 0 and handler.run:
-        filled = lib.morphology.morph(handler, offset, filled)
+        morphed = lib.morphology.morph(handler, offset, filled)
+        _TILE_POOL.release(filled.values())
+        filled = morphed
 
     # Feather (Gaussian blur)
     if feather != 0 and handler.run:
-        filled = lib.morphology.blur(handler, feather, filled)
+        blurred = lib.morphology.blur(handler, feather, filled)
+        _TILE_POOL.release(filled.values())
+        filled = blurred
 
     # When dilating or blurring the fill, only respect the
     # bounding box limits if they are set by an active frame
@@ -340,26 +466,20 @@ def _flood_fill(src, args, dst, handler):
             handler, args,
             trim_result, filled, tiles_bbox, dst
         )
+    _TILE_POOL.release(filled.values())
+
+
+# Min/max, x/y bounding box containing no coordinates
+_EMPTY_BBOX = (float("inf"), float("inf"), float("-inf"), float("-inf"))
 
 
 def update_bbox(bbox, tx, ty):
     """Update given the min/max, x/y bounding box
-    If a coordinate lies outside of the current
-    bounds, set the bounds based on that coordinate
+    Return the bounds extended to include the given coordinate.
+    Start from _EMPTY_BBOX to create a new bounding box.
     """
-    if bbox:
-        min_tx, min_ty, max_tx, max_ty = bbox
-        if tx < min_tx:
-            min_tx = tx
-        elif tx > max_tx:
-            max_tx = tx
-        if ty < min_ty:
-            min_ty = ty
-        elif ty > max_ty:
-            max_ty = ty
-        return min_tx, min_ty, max_tx, max_ty
-    else:
-        return tx, ty, tx, ty
+    min_tx, min_ty, max_tx, max_ty = bbox
+    return min(min_tx, tx), min(min_ty, ty), max(max_tx, tx), max(max_ty, ty)
 
 
 def composite(
@@ -371,12 +491,11 @@ def composite(
 
     fill_col = fill_args.color
 
-    # Prepare opaque color rgba tile for copying
-    full_rgba = myplib.rgba_tile_from_alpha_tile(
-        _FULL_TILE, *(fill_col + (0, 0, N-1, N-1)))
+    # Opaque color rgba tile for copying
+    full_rgba = _full_rgba_tile(*fill_col[:3])
 
     # Bounding box of tiles that need updating
-    dst_changed_bbox = None
+    dst_changed_bbox = _EMPTY_BBOX
     dst_tiles = dst.get_tiles()
 
     skip_empty_dst = fill_args.skip_empty_dst()
@@ -385,26 +504,65 @@ def composite(
     opacity = fill_args.opacity
 
     tile_combine = myplib.tile_combine
+    tile_copy = myplib.tile_copy_rgba16_into_rgba16
+    colorize_into = myplib.rgba_tile_from_alpha_tile_into
+    tile_request = dst.tile_request
+
+    # The handling of fully filled inner tiles only depends on the
+    # mode and opacity, so it is decided once, instead of per tile.
+    opaque = opacity == 1.0
+    copy_full = opaque and mode == myplib.CombineNormal
+    drop_full = opaque and mode == myplib.CombineDestinationOut
+    skip_full = opaque and mode == myplib.CombineDestinationIn
+
+    # Fully transparent tiles (from morphology/blur) leave the destination
+    # unchanged, except in the modes that clear what lies outside the fill
+    skip_empty_src = mode not in (
+        myplib.CombineDestinationIn, myplib.CombineDestinationAtop
+    )
+
+    # If alpha locking is enabled in combination with a mode other than
+    # CombineNormal, we need to copy the dst tile to mask the result
+    mask = None
+    if lock_alpha and mode != myplib.CombineSourceAtop:
+        mask = np.empty((N, N, 4), 'uint16')
+        mask_mode = myplib.CombineDestinationAtop
 
-    # Composite filled tiles into the destination surface
-    for tile_coord, src_tile in iteritems(filled):
+    # Partially filled tiles are colorized into a single reused rgba tile
+    # right before it is combined, keeping it resident in the cache
+    rgba_scratch = np.empty((N, N, 4), 'uint16')
+
+    min_tx, min_ty = tiles_bbox.min_tx, tiles_bbox.min_ty
+    max_tx, max_ty = tiles_bbox.max_tx, tiles_bbox.max_ty
+
+    # Composite filled tiles into the destination surface, in row-major
+    # order, for better locality of access to the destination tiles
+    tiles_to_composite = sorted(
+        filled.items(), key=lambda item: (item[0][1], item[0][0])
+    )
+    for tile_coord, src_tile in tiles_to_composite:
 
         if not handler.run:
             break
 
         handler.inc_processed()
 
+        if src_tile is _EMPTY_TILE and skip_empty_src:
+            continue
+
         # Omit tiles outside of the bounding box _if_ the frame is enabled
         # Note:filled tiles outside bbox only originates from dilation/blur
-        if trim_result and tiles_bbox.outside(tile_coord):
-            continue
+        if trim_result:
+            tx, ty = tile_coord
+            if tx < min_tx or tx > max_tx or ty < min_ty or ty > max_ty:
+                continue
 
         # Skip empty destination tiles for erasing and alpha locking
         # Avoids completely unnecessary tile allocation and copying
         if skip_empty_dst and tile_coord not in dst_tiles:
             continue
 
-        with dst.tile_request(*tile_coord, readonly=False) as dst_tile:
+        with tile_request(*tile_coord, readonly=False) as dst_tile:
 
             # Only at this point might the bounding box need to be updated
             dst_changed_bbox = update_bbox(dst_changed_bbox, *tile_coord)
@@ -412,39 +570,37 @@ def composite(
             # Under certain conditions, direct copies and dict manipulation
             # can be used instead of compositing operations.
             cut_off = trim_result and tiles_bbox.crossing(tile_coord)
-            full_inner = src_tile is _FULL_TILE and not cut_off
-            if full_inner:
-                if mode == myplib.CombineNormal and opacity == 1.0:
-                    myplib.tile_copy_rgba16_into_rgba16(full_rgba, dst_tile)
+            if src_tile is _FULL_TILE and not cut_off:
+                if copy_full:
+                    tile_copy(full_rgba, dst_tile)
                     continue
-                elif mode == myplib.CombineDestinationOut and opacity == 1.0:
+                elif drop_full:
                     dst_tiles.pop(tile_coord)
                     continue
-                elif mode == myplib.CombineDestinationIn and opacity == 1.0:
+                elif skip_full:
                     continue
                 # Even if opacity != 1.0, we can reuse the full rgba tile
                 src_tile_rgba = full_rgba
             else:
-                if trim_result:
+                # Only tiles crossing the frame have partial bounds
+                if cut_off:
                     tile_bounds = tiles_bbox.tile_bounds(tile_coord)
                 else:
-                    tile_bounds = (0, 0, N-1, N-1)
-                src_tile_rgba = myplib.rgba_tile_from_alpha_tile(
-                    src_tile, *(fill_col + tile_bounds)
+                    tile_bounds = _FULL_BOUNDS
+                colorize_into(
+                    src_tile, *(fill_col + tile_bounds + (rgba_scratch,))
                 )
+                src_tile_rgba = rgba_scratch
 
-            # If alpha locking is enabled in combination with a mode other than
-            # CombineNormal, we need to copy the dst tile to mask the result
-            if lock_alpha and mode != myplib.CombineSourceAtop:
-                mask = np.copy(dst_tile)
-                mask_mode = myplib.CombineDestinationAtop
+            if mask is not None:
+                np.copyto(mask, dst_tile)
                 tile_combine(mode, src_tile_rgba, dst_tile, True, opacity)
                 tile_combine(mask_mode, mask, dst_tile, True, 1.0)
             else:
                 tile_combine(mode, src_tile_rgba, dst_tile, True, opacity)
 
     # Handle dst-out and dst-atop: clear untouched tiles
-    if mode in [myplib.CombineDestinationIn, myplib.CombineDestinationAtop]:
+    if not skip_empty_src:
         for tile_coord in list(dst_tiles.keys()):
             if not handler.run:
                 break
@@ -455,7 +611,7 @@ def composite(
                 with dst.tile_request(*tile_coord, readonly=False):
                     dst_tiles.pop(tile_coord)
 
-    if dst_changed_bbox and handler.run:
+    if dst_changed_bbox is not _EMPTY_BBOX and handler.run:
         min_tx, min_ty, max_tx, max_ty = dst_changed_bbox
         bbox = (
             min_tx * N, min_ty * N,
@@ -494,72 +650,169 @@ def scanline_fill(handler, src, seed_lists, tiles_bbox, filler):
     # Dict of coord->tile data populated during the fill
     filled = {}
 
-    inv_edges = (
-        EDGE.south,
-        EDGE.west,
-        EDGE.north,
-        EDGE.east
-    )
-
     # Starting coordinates + direction of origin (from within)
-    tileq = []
-    for seed_tile_coord, seeds in iteritems(seed_lists):
+    tileq = deque()
+    for seed_tile_coord, seeds in seed_lists.items():
         tileq.append((seed_tile_coord, seeds, myplib.edges.none))
 
     tfs = _TileFillSkipper(tiles_bbox, filler, set({}))
+    _fill_queued(handler, src, tileq, tiles_bbox, filler, tfs, filled)
+    return filled
 
+
+def _fill_queued(handler, src, tileq, tiles_bbox, filler, tfs, filled):
+    """Scanline fill loop, filling queued tiles until the queue is empty
+
+    Queued seeds entering a tile from the same side are merged when
+    popped, so that they are filled in a single call. The per-tile fills
+    release the GIL, so when there are enough cores and enough distinct
+    tiles are queued, they are filled concurrently by a pool of threads.
+    """
+
+    def fill_tile(fill, tile_coord, seeds, from_dir, src_tile):
+        """Fill a single tile using the fill function, unless skippable"""
+        # See if the tile can be skipped
+        overflows = tfs.check(tile_coord, src_tile, filled, from_dir)
+        if overflows is not None:
+            handler.inc_processed()
+            return overflows
+        if tile_coord not in filled:
+            handler.inc_processed()
+            filled[tile_coord] = _TILE_POOL.zeros()
+        return fill(
+            src_tile, filled[tile_coord], seeds,
+            from_dir, *tiles_bbox.tile_bounds(tile_coord)
+        )
+
+    max_batch = _max_batch_size()
     while len(tileq) > 0 and handler.run:
-        tile_coord, seeds, from_dir = tileq.pop(0)
-        # Skip if the tile has been fully processed already
-        if tile_coord in tfs.final:
+        batch = _pop_batch(tileq, tfs.final, max_batch)
+        if len(batch) < _MIN_PARALLEL_BATCH:
+            for tile_coord, seeds, from_dir in batch:
+                with src.tile_request(*tile_coord, readonly=True) as src_tile:
+                    overflows = fill_tile(
+                        filler.fill, tile_coord, seeds, from_dir, src_tile
+                    )
+                enqueue_overflows(
+                    tileq, tile_coord, overflows, tiles_bbox,
+                    _INV_EDGES, tfs.final
+                )
             continue
-        # Flood-fill one tile
-        with src.tile_request(*tile_coord, readonly=True) as src_tile:
-            # See if the tile can be skipped
-            overflows = tfs.check(tile_coord, src_tile, filled, from_dir)
-            if overflows is None:
-                if tile_coord not in filled:
-                    handler.inc_processed()
-                    filled[tile_coord] = np.zeros((N, N), 'uint16')
-                overflows = filler.fill(
-                    src_tile, filled[tile_coord], seeds,
-                    from_dir, *tiles_bbox.tile_bounds(tile_coord)
+        submit = functools.partial(_fill_executor().submit, filler.fill)
+        with contextlib.ExitStack() as src_tiles:
+            results = []
+            for tile_coord, seeds, from_dir in batch:
+                src_tile = src_tiles.enter_context(
+                    src.tile_request(*tile_coord, readonly=True)
                 )
-            else:
-                handler.inc_processed()
-        enqueue_overflows(tileq, tile_coord, overflows, tiles_bbox, inv_edges)
-    return filled
+                overflows = fill_tile(
+                    submit, tile_coord, seeds, from_dir, src_tile
+                )
+                results.append((tile_coord, overflows))
+            # The source tiles must not be released before
+            # all of the fills in the batch have completed
+            for tile_coord, overflows in results:
+                if isinstance(overflows, Future):
+                    overflows = overflows.result()
+                enqueue_overflows(
+                    tileq, tile_coord, overflows, tiles_bbox,
+                    _INV_EDGES, tfs.final
+                )
+
+
+def _max_batch_size():
+    """Return the maximum number of tiles to process concurrently
+
+    When there are too few cores for the minimum batch size, 1 is
+    returned, and tiles are processed one at a time, in order, which
+    avoids the overhead of batching where it cannot pay off.
+    """
+    cpus = os.cpu_count() or 1
+    return cpus if cpus >= _MIN_PARALLEL_BATCH else 1
+
+
+_FILL_EXECUTOR = None
+_FILL_EXECUTOR_LOCK = threading.Lock()
+
+
+def _fill_executor():
+    """Return the thread pool shared by all fills, created on first use
+
+    The worker threads are kept around between fills, instead of being
+    started and joined for every fill that is large enough to use them.
+    Fills run in separate threads, hence the lock around the creation.
+    """
+    global _FILL_EXECUTOR
+    with _FILL_EXECUTOR_LOCK:
+        if _FILL_EXECUTOR is None:
+            _FILL_EXECUTOR = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1
+            )
+        return _FILL_EXECUTOR
+
+
+def _pop_batch(queue, final, max_size):
+    """Pop up to max_size queue items for distinct, non-final tiles
+
+    Items for tiles that have been fully processed already are discarded.
+    Items entering a tile in the batch from the same direction as the
+    batched item are merged into it, so that the seeds are filled in
+    a single call. Popping stops at the first item for a tile in the
+    batch with a different direction, or for a new tile when the batch
+    is full, leaving that item at the front of the queue.
+    """
+    batch = []
+    batch_index = {}
+    while queue:
+        tile_coord, seeds, from_dir = queue[0]
+        if tile_coord in final:
+            queue.popleft()
+            continue
+        index = batch_index.get(tile_coord)
+        if index is None:
+            if len(batch) >= max_size:
+                break
+            batch_index[tile_coord] = len(batch)
+            batch.append(queue.popleft())
+        elif batch[index][2] == from_dir:
+            queue.popleft()
+            merged_seeds = list(batch[index][1])
+            merged_seeds.extend(seeds)
+            batch[index] = (tile_coord, merged_seeds, from_dir)
+        else:
+            break
+    return batch
 
 
 class _TileFillSkipper:
     """Provides checking for, and handling of, uniform tiles"""
 
-    FULL_OVERFLOWS = [
-        ((), [(0, N-1)], [(0, N-1)], [(0, N-1)]),         # from north
-        ([(0, N-1)], (), [(0, N-1)], [(0, N-1)]),         # from east
-        ([(0, N-1)], [(0, N-1)], (), [(0, N-1)]),         # from south
-        ([(0, N-1)], [(0, N-1)], [(0, N-1)], ()),         # from west
-        ([(0, N-1)], [(0, N-1)], [(0, N-1)], [(0, N-1)])  # from within
-    ]
+    # The overflows are shared between queue items, hence immutable
+    _FULL_EDGE = ((0, N-1),)
+    FULL_OVERFLOWS = (
+        ((), _FULL_EDGE, _FULL_EDGE, _FULL_EDGE),          # from north
+        (_FULL_EDGE, (), _FULL_EDGE, _FULL_EDGE),          # from east
+        (_FULL_EDGE, _FULL_EDGE, (), _FULL_EDGE),          # from south
+        (_FULL_EDGE, _FULL_EDGE, _FULL_EDGE, ()),          # from west
+        (_FULL_EDGE, _FULL_EDGE, _FULL_EDGE, _FULL_EDGE),  # from within
+    )
+    NO_OVERFLOWS = ((), (), (), ())
 
     def __init__(self, tiles_bbox, filler, final):
 
-        self.uniform_tiles = {}
         self.final = final
         self.tiles_bbox = tiles_bbox
         self.filler = filler
+        # Fill alpha of the (transparent) empty tile, the same for all of them
+        self.empty_alpha = filler.tile_uniformity(True, None)
 
-    # Dict of alpha->tile, used for uniform non-opaque tile fills
-    # NOTE: these are usually not a result of an intentional fill, but
-    # clicking a pixel with color very similar to the intended target pixel
-    def uniform_tile(self, alpha):
-        """ Return a reference to a uniform alpha tile
-
-        If no uniform tile with the given alpha value exists, one is created
-        """
-        if alpha not in self.uniform_tiles:
-            self.uniform_tiles[alpha] = fc.new_full_tile(alpha)
-        return self.uniform_tiles[alpha]
+    # Uniform tiles are used for uniform tile fills; the non-opaque ones
+    # are usually not a result of an intentional fill, but clicking a
+    # pixel with color very similar to the intended target pixel
+    @staticmethod
+    def uniform_tile(alpha):
+        """ Return a reference to a shared uniform alpha tile"""
+        return _uniform_alpha_tile(alpha)
 
     def check(self, tile_coord, src_tile, filled, from_dir):
         """Check if the tile can be handled without using the fill loop.
@@ -577,8 +830,10 @@ class _TileFillSkipper:
 
         # Returns the alpha of the fill for the tile's color if
         # the tile is uniform, otherwise returns None
-        is_empty = src_tile is _EMPTY_RGBA
-        alpha = self.filler.tile_uniformity(is_empty, src_tile)
+        if src_tile is _EMPTY_RGBA:
+            alpha = self.empty_alpha
+        else:
+            alpha = self.filler.tile_uniformity(False, src_tile)
 
         if alpha is None:
             # No shortcut can be taken, create new tile
@@ -589,11 +844,8 @@ class _TileFillSkipper:
         # cannot be filled at all (unlikely, but not impossible)
         self.final.add(tile_coord)
         if alpha == 0:
-            return [(), (), (), ()]
-        elif alpha == _OPAQUE:
-            filled[tile_coord] = _FULL_TILE
-        else:
-            filled[tile_coord] = self.uniform_tile(alpha)
+            return self.NO_OVERFLOWS
+        filled[tile_coord] = self.uniform_tile(alpha)
         return self.FULL_OVERFLOWS[from_dir]
 
 
@@ -608,12 +860,12 @@ def gap_closing_fill(
     are marked in separate tiles - one for each tile filled.
     """
 
-    unseep_queue = []
+    unseep_queue = deque()
     filled = {}
     final = set({})
 
-    seed_queue = []
-    for seed_tile_coord, seeds in iteritems(seed_lists):
+    seed_queue = deque()
+    for seed_tile_coord, seeds in seed_lists.items():
         seed_queue.append((seed_tile_coord, seeds))
 
     options = gap_closing_options
@@ -622,11 +874,14 @@ def gap_closing_fill(
     gc_handler = _GCTileHandler(final, max_gap_size, tiles_bbox, filler, src)
     total_px = 0
     skip_unseeping = False
+    max_batch = _max_batch_size()
 
     while len(seed_queue) > 0 and handler.run:
-        tile_coord, seeds = seed_queue.pop(0)
+        tile_coord, seeds = seed_queue.popleft()
         if tile_coord in final:
             continue
+        # Search for gaps ahead of time, concurrently when possible
+        gc_handler.search_ahead(tile_coord, seed_queue, max_batch)
         # Create distance-data and alpha output tiles for the fill
         # and check if the tile can be skipped directly
         alpha_t, dist_t, overflows = gc_handler.get_gc_data(tile_coord, seeds)
@@ -646,7 +901,7 @@ def gap_closing_fill(
             # Create new output tile if not already present
             if tile_coord not in filled:
                 handler.inc_processed()
-                filled[tile_coord] = np.zeros((N, N), 'uint16')
+                filled[tile_coord] = _TILE_POOL.zeros()
             # Run the gap-closing fill for the tile
             result = gc_filler.fill(
                 alpha_t, dist_t, filled[tile_coord], seeds, *px_bounds
@@ -663,7 +918,9 @@ def gap_closing_fill(
             if not skip_unseeping and fill_edges:
                 unseep_queue.append((tile_coord, fill_edges, True))
         # Enqueue overflows, whether skipping or not
-        enqueue_overflows(seed_queue, tile_coord, overflows, tiles_bbox)
+        enqueue_overflows(
+            seed_queue, tile_coord, overflows, tiles_bbox, final=final
+        )
 
     # If enabled, pull the fill back into the gaps to stop before them
     if not skip_unseeping and handler.run:
@@ -671,6 +928,7 @@ def gap_closing_fill(
             unseep_queue, filled, gc_filler,
             total_px, tiles_bbox, gc_handler.distances
         )
+    gc_handler.release_tiles()
     return filled
 
 
@@ -680,23 +938,32 @@ class _GCTileHandler(object):
     Manages input alpha tiles and distance tiles necessary to perform
     gap closing fill operations.
     """
-    OVERFLOWS = [
-        [(), (EDGE.west,), (EDGE.north,), (EDGE.east,)],
-        [(EDGE.south,), (), (EDGE.north,), (EDGE.east,)],
-        [(EDGE.south,), (EDGE.west,), (), (EDGE.east,)],
-        [(EDGE.south,), (EDGE.west,), (EDGE.north,), ()],
-        [(EDGE.south,), (EDGE.west,), (EDGE.north,), (EDGE.east,)],
-    ]
+    OVERFLOWS = (
+        ((), (EDGE.west,), (EDGE.north,), (EDGE.east,)),
+        ((EDGE.south,), (), (EDGE.north,), (EDGE.east,)),
+        ((EDGE.south,), (EDGE.west,), (), (EDGE.east,)),
+        ((EDGE.south,), (EDGE.west,), (EDGE.north,), ()),
+        ((EDGE.south,), (EDGE.west,), (EDGE.north,), (EDGE.east,)),
+    )
 
     def __init__(self, final, max_gap_size, tiles_bbox, filler, src):
         self._src = src
         self.final = final
         self.distances = dict()
         self._alpha_tiles = dict()
-        self._dist_data = None
+        # Distance tiles from searches not yet used by get_gc_data,
+        # with None marking tiles where no gaps were found
+        self._searched = dict()
+        self._alpha_data = None
         self._bbox = tiles_bbox
         self._filler = filler
-        self._distbucket = myplib.DistanceBucket(max_gap_size)
+        # Alpha tile shared by all empty source tiles
+        self._empty_alpha_tile = _uniform_alpha_tile(
+            filler.tile_uniformity(True, None)
+        )
+        self._max_gap_size = max_gap_size
+        # One bucket per concurrent search
+        self._distbuckets = []
 
     def get_gc_data(self, tile_coord, seeds):
         """Get the data necessary to run a gap-closing fill
@@ -712,16 +979,14 @@ class _GCTileHandler(object):
         :rtype: tuple
         """
         if tile_coord not in self.distances:
-            # Ensure that alpha data exists for the tile and its neighbours
-            grid, all_full = self.alpha_grid(tile_coord)
-            # The search is skipped if we have a 9-grid of only full tiles
-            # since there cannot be any gaps in that case. Otherwise, if no
-            # gaps were found during the search, use a constant distance tile
-            if all_full or not self.find_gaps(*grid):
+            if tile_coord not in self._searched:
+                self.search((tile_coord,))
+            dist_tile = self._searched.pop(tile_coord)
+            if dist_tile is None:
                 self.distances[tile_coord] = _GAPLESS_TILE
                 # Check if fill can be skipped directly
                 can_skip_fill = (
-                    (all_full or grid[0] is _FULL_TILE) and
+                    self._alpha_tiles[tile_coord] is _FULL_TILE and
                     not self._bbox.crossing(tile_coord) and
                     gc_seeds_skippable(seeds)
                 )
@@ -733,22 +998,89 @@ class _GCTileHandler(object):
                         overflows = self.OVERFLOWS[seeds[0]]
                     return _FULL_TILE, _GAPLESS_TILE, overflows
             else:
-                self.distances[tile_coord] = self._dist_data
-                self._dist_data = None
+                self.distances[tile_coord] = dist_tile
         # The distance data is already present, meaning the skip checks have
         # already been tried, no skipping possible.
         return self._alpha_tiles[tile_coord], self.distances[tile_coord], ()
 
-    def find_gaps(self, *grid):
-        """Search for and mark gaps, given a nine-grid of alpha tiles
+    def search_ahead(self, tile_coord, queue, max_size):
+        """Search for gaps for a tile and the next few queued tiles
+
+        The searches only depend on the source tiles, not on the fill
+        itself, so the tiles that are likely to be filled next can be
+        searched along with the current one. When there are enough of
+        them, the searches are run concurrently.
 
-        :param grid: nine-grid of alpha tiles
-        :return: True if any gaps were found, otherwise false
-        :rtype: bool
+        :param queue: queue of (tile_coord, seeds) items, peeked at only
+        :param max_size: the maximum number of tiles to search
         """
-        if self._dist_data is None:
-            self._dist_data = fc.new_full_tile(INF_DIST)
-        return myplib.find_gaps(self._distbucket, self._dist_data, *grid)
+        if not self._needs_search(tile_coord):
+            return
+        coords = [tile_coord]
+        for queued_coord, _ in itertools.islice(queue, 4 * max_size):
+            if len(coords) >= max_size:
+                break
+            if (self._needs_search(queued_coord) and
+                    queued_coord not in self.final and
+                    queued_coord not in coords):
+                coords.append(queued_coord)
+        self.search(coords)
+
+    def _needs_search(self, tile_coord):
+        return (
+            tile_coord not in self.distances and
+            tile_coord not in self._searched
+        )
+
+    def search(self, tile_coords):
+        """Search for and mark gaps around the given tiles
+
+        The distance tiles are stored for later use by get_gc_data.
+        The searches in a 9-grid of only full tiles are skipped, since
+        there cannot be any gaps in that case.
+        """
+        searches = []
+        for tile_coord in tile_coords:
+            grid, all_full = self.alpha_grid(tile_coord)
+            if all_full:
+                self._searched[tile_coord] = None
+            else:
+                searches.append((tile_coord, grid))
+        buckets = self._distbuckets
+        while len(buckets) < len(searches):
+            buckets.append(myplib.DistanceBucket(self._max_gap_size))
+        results = []
+        parallel = len(searches) >= _MIN_PARALLEL_BATCH
+        for bucket, (tile_coord, grid) in zip(buckets, searches):
+            dist_tile = _TILE_POOL.acquire(INF_DIST)
+            if parallel:
+                found = _fill_executor().submit(
+                    myplib.find_gaps, bucket, dist_tile, *grid
+                )
+            else:
+                found = myplib.find_gaps(bucket, dist_tile, *grid)
+            results.append((tile_coord, dist_tile, found))
+        for tile_coord, dist_tile, found in results:
+            if isinstance(found, Future):
+                found = found.result()
+            if found:
+                self._searched[tile_coord] = dist_tile
+            else:
+                # Use a constant distance tile when no gaps were found
+                self._searched[tile_coord] = None
+                _TILE_POOL.release((dist_tile,))
+
+    def release_tiles(self):
+        """Return the alpha and distance tiles to the tile pool"""
+        _TILE_POOL.release(self._alpha_tiles.values())
+        _TILE_POOL.release(self.distances.values())
+        _TILE_POOL.release(t for t in self._searched.values() if t is not None)
+        if self._alpha_data is not None:
+            _TILE_POOL.release((self._alpha_data,))
+        self._alpha_tiles.clear()
+        self.distances.clear()
+        self._searched.clear()
+        self._alpha_data = None
 
     def alpha_grid(self, tile_coord):
         """When needed, create and calculate alpha tiles for distance searching.
@@ -760,30 +1092,30 @@ class _GCTileHandler(object):
         :returns: Tuple with the grid and a boolean value indicating
         whether every tile in the grid is the constant full alpha tile
         """
-        all_full = True
         alpha_tiles = self._alpha_tiles
-        grid = []
-        for ntc in fc.nine_grid(tile_coord):
+        coords = fc.nine_grid(tile_coord)
+        for ntc in coords:
             if ntc not in alpha_tiles:
                 with self._src.tile_request(
                         ntc[0], ntc[1], readonly=True
                 ) as src_tile:
-                    is_empty = src_tile is _EMPTY_RGBA
-                    alpha = self._filler.tile_uniformity(is_empty, src_tile)
-                    if alpha == _OPAQUE:
-                        alpha_tiles[ntc] = _FULL_TILE
-                    elif alpha == 0:
-                        alpha_tiles[ntc] = _EMPTY_TILE
-                    elif alpha:
-                        alpha_tiles[ntc] = fc.new_full_tile(alpha)
+                    if src_tile is _EMPTY_RGBA:
+                        alpha_tiles[ntc] = self._empty_alpha_tile
+                        continue
+                    # The spare tile is only flooded if the source
+                    # tile is not uniform, otherwise it is kept for reuse
+                    if self._alpha_data is None:
+                        self._alpha_data = _TILE_POOL.zeros()
+                    alpha = self._filler.flood_if_nonuniform(
+                        src_tile, self._alpha_data
+                    )
+                    if alpha is not None:
+                        alpha_tiles[ntc] = _uniform_alpha_tile(alpha)
                     else:
-                        alpha_tile = np.empty((N, N), 'uint16')
-                        self._filler.flood(src_tile, alpha_tile)
-                        alpha_tiles[ntc] = alpha_tile
-            tile = alpha_tiles[ntc]
-            grid.append(tile)
-            all_full = all_full and tile is _FULL_TILE
-        return grid, all_full
+                        alpha_tiles[ntc] = self._alpha_data
+                        self._alpha_data = None
+        grid = [alpha_tiles[ntc] for ntc in coords]
+        return grid, all(t is _FULL_TILE for t in grid)
 
 
 def unseep(seed_queue, filled, gc_filler, total_px, tiles_bbox, distances):
@@ -792,9 +1124,11 @@ def unseep(seed_queue, filled, gc_filler, total_px, tiles_bbox, distances):
     fill and therefore does not require creation of new tiles or use
     of an input alpha tile.
     """
+    # Per-tile lists of (x, y, value) change records, used to roll back
+    # the erasure; full tiles are just restored to the constant tile.
     backup = {}
     while len(seed_queue) > 0:
-        tile_coord, seeds, is_initial = seed_queue.pop(0)
+        tile_coord, seeds, is_initial = seed_queue.popleft()
         if tile_coord not in distances or tile_coord not in filled:
             continue
         if tile_coord not in backup:
@@ -802,12 +1136,15 @@ def unseep(seed_queue, filled, gc_filler, total_px, tiles_bbox, distances):
                 backup[tile_coord] = _FULL_TILE
                 filled[tile_coord] = fc.new_full_tile(1 << 15)
             else:
-                backup[tile_coord] = np.copy(filled[tile_coord])
+                backup[tile_coord] = []
         result = gc_filler.unseep(
             distances[tile_coord], filled[tile_coord], seeds, is_initial
         )
         overflows = result[0:4]
         num_erased_pixels = result[4]
+        changes = backup[tile_coord]
+        if changes is not _FULL_TILE and num_erased_pixels > 0:
+            changes.append(result[5])
         total_px -= num_erased_pixels
         enqueue_overflows(
             seed_queue, tile_coord, overflows, tiles_bbox, (False,) * 4
@@ -816,8 +1153,15 @@ def unseep(seed_queue, filled, gc_filler, total_px, tiles_bbox, distances):
         # For small areas, when starting on a distance-marked pixel,
         # backing off may remove the entire fill, in which case we
         # roll back the tiles that were processed
-        for tile_coord, tile in iteritems(backup):
-            filled[tile_coord] = tile
+        for tile_coord, changes in backup.items():
+            if changes is _FULL_TILE:
+                filled[tile_coord] = _FULL_TILE
+                continue
+            tile = filled[tile_coord]
+            # Each record holds a pixel at most once, and later records
+            # are undone first to get back to the values before unseeping
+            for records in reversed(changes):
+                tile[records[:, 1], records[:, 0]] = records[:, 2]
 
 
 def complement_gc_seeds(seeds, distance_tile):
@@ -21,13 +21,6 @@ N = myplib.TILE_SIZE
 logger = logging.getLogger(__name__)
 
 
-def adjacent_tiles(tile_coord, filled):
-    """ Return a tuple of tiles adjacent to the input tile coordinate.
-    Adjacent tiles that are not in the tileset are replaced by the empty tile.
-    """
-    return tuple([filled.get(c, _EMPTY_TILE) for c in fc.adjacent(tile_coord)])
-
-
 def complement_adjacent(tiles):
     """ Ensure that each tile in the input tileset has a full neighbourhood
     of eight tiles, setting missing tiles to the empty tile.
@@ -124,4 +117,4 @@ def blur(handler, radius, tiles):
 
 
 def adj_full(coord, tiles):
-    return all(t is _FULL_TILE for t in adjacent_tiles(coord, tiles))
+    return all(tiles.get(c) is _FULL_TILE for c in fc.adjacent(coord))
@@ -375,11 +375,15 @@ class BuildExt (build_ext):
          "to the rpath of mypaintlib (linux only)"),
         ("disable-openmp", None,
          "Don't use openmp, even if the platform supports it."),
+        ("enable-avx2", None,
+         "Use AVX2 instructions in the fill code. The resulting build "
+         "will only run on processors supporting AVX2."),
     ] + build_ext.user_options
 
     def initialize_options(self):
         self.set_rpath = False
         self.disable_openmp = False
+        self.enable_avx2 = False
         build_ext.initialize_options(self)
 
     def finalize_options(self):
@@ -401,6 +405,9 @@ class BuildExt (build_ext):
             linkflags.append(OPENMP_CFLAG)
             ccflags.append(OPENMP_LDFLAG)
 
+        if self.enable_avx2:
+            ccflags.append("-mavx2")
+
         if self.debug:
             skip = ["-DNDEBUG"]
             ccflags[:] = [f for f in ccflags if f not in skip]
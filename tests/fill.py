@@ -8,10 +8,14 @@ import os
 import sys
 from os.path import join
 import unittest
+from unittest import mock
 import contextlib
 import copy
+from collections import deque
 from itertools import repeat, chain, product
 
+import numpy as np
+
 from . import paths
 from lib import mypaintlib
 from lib import document
@@ -361,6 +365,317 @@ class CorrectnessTests(FillTestsBase):
                         )
                     )
 
+    @fill_test
+    def test_recycled_tiles(self):
+        # Fill tiles are reused between fills, a fill should produce
+        # the same result whether or not another fill preceded it
+        options = floodfill.GapClosingOptions(7, False)
+        cases = (
+            (self.closed_small_s, self.closed_small_c, None),
+            (self.gap_layers[0], self.gap_layers[1], options),
+        )
+        for src, other_src, gc in cases:
+            fresh_pool = floodfill._TilePool(256)
+            with mock.patch.object(floodfill, '_TILE_POOL', fresh_pool):
+                with self.fill_layers() as (f1, f2):
+                    self.fill(src, f1, gc=gc)
+                    self.fill(other_src, f2, gc=gc)
+                    f2.clear()
+                    self.fill(src, f2, gc=gc)
+                    self.assertTrue(
+                        self.layers_identical(f1, f2),
+                        msg="Fill should not be affected by recycled tiles!"
+                        " src={layer}".format(layer=src.name)
+                    )
+
+    @fill_test
+    def test_concurrent_fill(self):
+        # With enough cores, batches of tiles are processed concurrently,
+        # which should produce the same result as processing them in order
+        def reset_executor():
+            if floodfill._FILL_EXECUTOR is not None:
+                floodfill._FILL_EXECUTOR.shutdown()
+                floodfill._FILL_EXECUTOR = None
+
+        # The shared thread pool is sized from the (mocked) cpu count
+        # when created, so it must not outlive the test.
+        reset_executor()
+        self.addCleanup(reset_executor)
+        options = floodfill.GapClosingOptions(7, False)
+        cases = ((src, None) for src in self.large)
+        cases = chain(cases, ((src, options) for src in self.gap_layers))
+        for src, gc in cases:
+            with self.fill_layers() as (f1, f2):
+                with mock.patch.object(floodfill.os, 'cpu_count') as cpus:
+                    cpus.return_value = 1
+                    self.fill(src, f1, gc=gc)
+                    cpus.return_value = 8
+                    with mock.patch.object(
+                            floodfill, '_fill_executor',
+                            wraps=floodfill._fill_executor
+                    ) as executor:
+                        self.fill(src, f2, gc=gc)
+                self.assertTrue(
+                    executor.called,
+                    msg="Fill should have used the thread pool!"
+                    " src={layer}".format(layer=src.name)
+                )
+                self.assertTrue(
+                    self.layers_identical(f1, f2),
+                    msg="Concurrent fill results should be identical!"
+                    " src={layer}".format(layer=src.name)
+                )
+
+
+class FillerTests(unittest.TestCase):
+
+    @staticmethod
+    def random_tiles(seed, num_tiles):
+        """Yield tiles of few, nearly identical, colors"""
+        rng = np.random.RandomState(seed)
+        for _ in range(num_tiles):
+            colors = rng.randint(0, 1 << 15, (4, 4)).astype('uint16')
+            colors[1] = colors[0]
+            colors[1, rng.randint(4)] ^= 1 << rng.randint(16)
+            colors[2] = 0
+            colors[3, 3] = 0
+            yield colors[rng.randint(4, size=(N, N))]
+
+    def test_tile_uniformity(self):
+        filler = mypaintlib.Filler(0, 0, 0, 0, 0.2)
+        tiles = []
+        for pixel, channel in product((0, 1, N*N//2, N*N - 1), range(4)):
+            for value in (0, 1 << 15):
+                tile = np.full((N, N, 4), value, 'uint16')
+                tiles.append(tile.copy())
+                tile.reshape(N*N, 4)[pixel, channel] ^= 1
+                tiles.append(tile)
+        tiles.extend(self.random_tiles(1, 100))
+        for tile in tiles:
+            alpha = filler.tile_uniformity(False, tile)
+            uniform = bool((tile == tile[0, 0]).all())
+            self.assertEqual(
+                alpha is not None, uniform,
+                msg="Only tiles of identical pixels are uniform"
+            )
+            if uniform:
+                alphas = np.zeros((N, N), 'uint16')
+                filler.flood(tile, alphas)
+                self.assertEqual(
+                    alpha, alphas[0, 0],
+                    msg="Uniform tiles should get the fill alpha of the color"
+                )
+
+    def test_exact_flood(self):
+        tiles = list(self.random_tiles(2, 50))
+        tile = np.zeros((N, N, 4), 'uint16')
+        tile[N//2:, :, 3] = 1 << 15
+        tile[:, N//2:, :3] = 1
+        tiles.append(tile)
+        for tile in tiles:
+            for (x, y) in product((0, N//2, N - 1), repeat=2):
+                r, g, b, a = tile[y, x].tolist()
+                if a == 0:
+                    r, g, b = 0, 0, 0
+                filler = mypaintlib.Filler(r, g, b, a, 0.0)
+                # Only exact matches are filled, but any fully
+                # transparent pixel matches a transparent target
+                if a == 0:
+                    matching = tile[..., 3] == 0
+                else:
+                    matching = (tile == (r, g, b, a)).all(axis=2)
+                expected = np.where(matching, 1 << 15, 0)
+                result = np.zeros((N, N), 'uint16')
+                filler.flood(tile, result)
+                self.assertTrue(
+                    (result == expected).all(),
+                    msg="Zero tolerance floods should only fill exact"
+                    " matches! target={target}".format(target=(r, g, b, a))
+                )
+
+    def test_invalid_seeds(self):
+        # Four transparent regions, separated by opaque columns
+        tile = np.zeros((N, N, 4), 'uint16')
+        walls = (N//4, N//2, 3*N//4)
+        tile[:, walls, 3] = 1 << 15
+        filler = mypaintlib.Filler(0, 0, 0, 0, 0.2)
+        seeds = [
+            (1, 1),
+            (N//4 + 4, 2.0),  # float
+            (N//2 + 4, 4, 5),  # wrong length
+            7,  # not a sequence
+            (N - 1, N - 1),
+        ]
+        alphas = np.zeros((N, N), 'uint16')
+        filler.fill(
+            tile, alphas, seeds, mypaintlib.edges.none, 0, 0, N - 1, N - 1
+        )
+        self.assertTrue(
+            alphas[:, :walls[0]].all() and alphas[:, walls[2]+1:].all(),
+            msg="Valid seeds should be filled"
+        )
+        self.assertFalse(
+            alphas[:, walls[0]:walls[2]+1].any(),
+            msg="Invalid seeds should be skipped"
+        )
+        # No error should be left set for a following call to pick up
+        self.assertIsNone(filler.tile_uniformity(False, tile))
+
+
+class OverflowTests(unittest.TestCase):
+
+    def test_enqueue_overflows(self):
+        # Tiles (0, 0) to (2, 1), the southern neighbour lies outside
+        bbox = fill_common.TileBoundingBox((0, 0, 3*N, 2*N))
+        edges = mypaintlib.edges
+        seeds = ([(0, 5)], [(1, 2)], [(3, 4)], [(7, 8)])
+        final = {(2, 1)}
+        queue = deque([None])
+        floodfill.enqueue_overflows(
+            queue, (1, 1), seeds, bbox, floodfill._INV_EDGES, final
+        )
+        self.assertEqual(
+            list(queue), [
+                None,
+                ((1, 0), [(0, 5)], edges.south),
+                ((0, 1), [(7, 8)], edges.east),
+            ],
+            msg="Only seeds for non-final tiles in the bbox should be queued"
+        )
+        queue = deque()
+        floodfill.enqueue_overflows(queue, (1, 0), seeds, bbox)
+        self.assertEqual(
+            list(queue), [
+                ((2, 0), [(1, 2)]),
+                ((1, 1), [(3, 4)]),
+                ((0, 0), [(7, 8)]),
+            ],
+            msg="Without data, coordinate and seed pairs should be queued"
+        )
+        queue = deque()
+        floodfill.enqueue_overflows(queue, (1, 0), ([], [], [], []), bbox)
+        self.assertEqual(
+            list(queue), [],
+            msg="Empty seed lists should not be queued"
+        )
+        with self.assertRaises(IndexError):
+            floodfill.enqueue_overflows(queue, (1, 1), ([(0, 5)],), bbox)
+        with self.assertRaises(TypeError):
+            floodfill.enqueue_overflows(queue, (1, 1), None, bbox)
+
+
+class QueueTests(unittest.TestCase):
+
+    @staticmethod
+    def tile_source(tile):
+        """Return a surface-like object with the given tile at (0, 0)"""
+        class TileSource(object):
+            @contextlib.contextmanager
+            def tile_request(self, tx, ty, readonly):
+                yield tile
+        return TileSource()
+
+    def test_pop_batch(self):
+        edges = mypaintlib.edges
+        queue = deque((
+            ((0, 0), [(0, 3)], edges.north),
+            ((1, 0), [(1, 2)], edges.west),
+            ((2, 0), [(5, 5)], edges.west),
+            ((0, 0), [(9, 9)], edges.north),
+            ((1, 0), [(4, 4)], edges.south),
+        ))
+        batch = floodfill._pop_batch(queue, {(2, 0)}, 4)
+        self.assertEqual(
+            batch, [
+                ((0, 0), [(0, 3), (9, 9)], edges.north),
+                ((1, 0), [(1, 2)], edges.west),
+            ],
+            msg="Seeds entering a tile from the same side should be merged"
+        )
+        self.assertEqual(
+            list(queue), [((1, 0), [(4, 4)], edges.south)],
+            msg="Popping should stop at another side of a batched tile"
+        )
+
+    def test_merged_seeds(self):
+        # A tile with a wall, so that the fill cannot be skipped
+        tile = np.zeros((N, N, 4), 'uint16')
+        tile[:, N//2, 3] = 1 << 15
+        filler = mock.Mock(wraps=mypaintlib.Filler(0, 0, 0, 0, 0.2))
+        bbox = fill_common.TileBoundingBox((0, 0, N, N))
+        tfs = floodfill._TileFillSkipper(bbox, filler, set())
+        north = mypaintlib.edges.north
+        queue = deque((
+            ((0, 0), [(0, 3)], north),
+            ((0, 0), [(N - 4, N - 1)], north),
+        ))
+        filled = {}
+        floodfill._fill_queued(
+            floodfill.FillHandler(), self.tile_source(tile),
+            queue, bbox, filler, tfs, filled
+        )
+        self.assertEqual(
+            filler.fill.call_count, 1,
+            msg="Seeds for the same tile and side should be filled at once"
+        )
+        seeds = filler.fill.call_args[0][2]
+        self.assertEqual(seeds, [(0, 3), (N - 4, N - 1)])
+        alphas = filled[(0, 0)]
+        self.assertTrue(
+            alphas[:, :N//2].all() and alphas[:, N//2+1:].all(),
+            msg="Both sides of the wall should be filled"
+        )
+
+
+class UnseepTests(unittest.TestCase):
+
+    def test_rollback(self):
+        # When seep retraction erases more than what was filled,
+        # the erasure is rolled back, restoring the filled tiles.
+        rng = np.random.RandomState(3)
+        alphas = rng.randint(1, 1 << 15, (N, N)).astype('uint16')
+        alphas[rng.rand(N, N) < 0.3] = 0
+        # A gap covering the left half of the tiles
+        dist = np.full((N, N), floodfill.INF_DIST, 'uint16')
+        dist[:, :N//2] = 4
+        distances = {(0, 0): dist, (1, 0): dist}
+        # Initial seeds lie on pixels where the fill was stopped,
+        # other seeds on filled pixels
+        ys, xs = np.nonzero(alphas[:, :N//2] == 0)
+        seeds = [(x, y, 4) for x, y in zip(xs[:20], ys[:20])]
+        ys, xs = np.nonzero(alphas[:, :N//2] != 0)
+        inner_seeds = [(x, y, 4) for x, y in zip(xs[-20:], ys[-20:])]
+        bbox = fill_common.TileBoundingBox((0, 0, 2*N, N))
+        gc_filler = mypaintlib.GapClosingFiller(10, True)
+
+        def unseep(total_px):
+            filled = {(0, 0): alphas.copy(), (1, 0): fill_common._FULL_TILE}
+            queue = deque((
+                ((0, 0), seeds, True),
+                ((0, 0), inner_seeds, False),
+                ((1, 0), [(0, y, 4) for y in range(N)], False),
+            ))
+            floodfill.unseep(
+                queue, filled, gc_filler, total_px, bbox, distances
+            )
+            return filled
+
+        erased = unseep(2*N*N)
+        self.assertTrue(
+            (erased[(0, 0)] != alphas).any() and
+            not erased[(1, 0)].all(),
+            msg="Seep retraction should erase pixels in both tiles"
+        )
+        restored = unseep(1)
+        self.assertTrue(
+            (restored[(0, 0)] == alphas).all(),
+            msg="Rolling back should restore the partially filled tile"
+        )
+        self.assertIs(
+            restored[(1, 0)], fill_common._FULL_TILE,
+            msg="Rolling back should restore the fully filled tile"
+        )
+
 
 # Performance tests, not run as part of the standard test suite
 